@@ -1,3 +1,13 @@
-from jsonschema_pydantic.transform import jsonschema_to_pydantic
+from jsonschema_pydantic.transform import (
+    cache_clear,
+    jsonschema_to_pydantic,
+    jsonschema_to_pydantic_many,
+    jsonschema_to_validator,
+)
 
-__all__ = ["jsonschema_to_pydantic"]
+__all__ = [
+    "cache_clear",
+    "jsonschema_to_pydantic",
+    "jsonschema_to_pydantic_many",
+    "jsonschema_to_validator",
+]
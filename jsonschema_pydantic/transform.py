@@ -1,97 +1,529 @@
-from typing import Any, Dict, List, Optional, Type, Union
+from __future__ import annotations
 
-from pydantic import BaseModel as BaseModelV2
-from pydantic import Field as FieldV2
-from pydantic import create_model as create_model_v2
-from pydantic.v1 import BaseModel as BaseModelV1
-from pydantic.v1 import Field as FieldV1
-from pydantic.v1 import create_model as create_model_v1
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import blake2b as _blake2b
+from json import dumps as _dumps
+from math import isfinite as _isfinite
+from threading import Lock
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    ForwardRef,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Type,
+    Union,
+)
+from weakref import WeakValueDictionary
 
+if TYPE_CHECKING:
+    from pydantic import BaseModel as BaseModelV2
 
-def jsonschema_to_pydantic(
-    schema: dict, definitions: dict = None, version: int = 2
-) -> Type[BaseModelV2]:
+_LIST_ANY = List[Any]
+_DICT_STR_ANY = Dict[str, Any]
+
+# primitive types, "array" and "object" are converted from their items / properties
+_TYPE_MAPPING = {
+    "string": str,
+    "number": float,
+    "integer": int,
+    "boolean": bool,
+    "null": None,
+}
+
+# marks a type missing from _TYPE_MAPPING, since "null" maps to None
+_MISSING = object()
+
+
+@lru_cache(maxsize=4096)
+def _optional_cached(type_: Any) -> Any:
+    return Optional[type_]
+
+
+@lru_cache(maxsize=4096)
+def _list_of_cached(type_: Any) -> Any:
+    return List[type_]
+
+
+@lru_cache(maxsize=4096)
+def _union_cached(types: tuple) -> Any:
+    return Union[types]  # type: ignore
+
+
+def _optional(type_: Any) -> Any:
+    # typing subscriptions allocate a new alias each time, cache hashable types
+    try:
+        return _optional_cached(type_)
+    except TypeError:
+        return Optional[type_]
+
+
+def _list_of(type_: Any) -> Any:
+    try:
+        return _list_of_cached(type_)
+    except TypeError:
+        return List[type_]
+
+
+def _union(types: tuple) -> Any:
+    # member order is kept, v1 validates members left to right and the json
+    # schema anyOf follows the same order
+    try:
+        return _union_cached(types)
+    except TypeError:
+        return Union[types]  # type: ignore
+
+
+@lru_cache(maxsize=None)
+def _json_type_to_python(types: tuple) -> Any:
+    """Return the python type for a tuple of primitive jsonschema types"""
+    return _union(tuple(_TYPE_MAPPING.get(type_, Any) for type_ in types))
+
+
+@lru_cache(maxsize=None)
+def _version_impl(version: int) -> tuple:
+    """Return (BaseModel, Field, create_model) for a pydantic version"""
+    # imported on first use, importing pydantic models is the bulk of import time
     if version == 1:
-        BaseModel, Field, create_model = BaseModelV1, FieldV1, create_model_v1  # noqa: F841
+        from pydantic.v1 import BaseModel as BaseModelV1
+        from pydantic.v1 import Field as FieldV1
+        from pydantic.v1 import create_model as create_model_v1
+
+        return BaseModelV1, FieldV1, create_model_v1
     elif version == 2:
-        BaseModel, Field, create_model = BaseModelV2, FieldV2, create_model_v2  # noqa: F841
+        from pydantic import BaseModel as BaseModelV2
+        from pydantic import Field as FieldV2
+        from pydantic import create_model as create_model_v2
+
+        return BaseModelV2, FieldV2, create_model_v2
     else:
         raise ValueError(f"Unsupported version: {version}")
 
-    title = schema.get("title", "DynamicModel")
-    description = schema.get("description", None)
 
-    # top level schema provides definitions
-    if definitions is None:
-        if "$defs" in schema:
-            definitions = schema["$defs"]
-        elif "definitions" in schema:
-            definitions = schema["definitions"]
+_NO_DEFINITIONS: dict = {}
+
+# keys that hold definitions rather than the schema of a model
+_DEFINITIONS_KEYS = frozenset(("$defs", "definitions"))
+
+# models keyed on (schema hash, definitions hash, impl). models are held weakly
+# so one-off schemas don't accumulate, while _RECENT_MODELS keeps the most
+# recently used alive.
+_MODEL_CACHE: WeakValueDictionary[tuple, Type[BaseModelV2]] = WeakValueDictionary()
+_RECENT_MODELS: OrderedDict[tuple, Type[BaseModelV2]] = OrderedDict()
+_MODEL_CACHE_SIZE = 1024
+
+# guards the lookup, reorder and eviction steps of the LRU caches, another
+# thread's eviction could otherwise remove a key between them
+_CACHE_LOCK = Lock()
+
+
+def _mark_recent(key: tuple, model: Type[BaseModelV2]) -> None:
+    with _CACHE_LOCK:
+        _RECENT_MODELS[key] = model
+        _RECENT_MODELS.move_to_end(key)
+        if len(_RECENT_MODELS) > _MODEL_CACHE_SIZE:
+            _RECENT_MODELS.popitem(last=False)
+
+
+# types that are serialized as themselves. subclasses, e.g. a str Enum, would be
+# serialized like their base type and share its key, as would tuples with lists.
+_JSON_SCALARS = frozenset((str, int, bool, type(None)))
+_JSON_CONTAINERS = frozenset((dict, list))
+
+
+def _check_json(value: Any) -> None:
+    """Raise for values that would be serialized like a different value.
+
+    json writes str and int subclasses like their base type and converts keys to
+    strings, orjson writes enums as their value and nan and infinity as null.
+    """
+    if type(value) is dict:
+        for key in value:
+            if type(key) is not str:
+                raise TypeError(f"keys must be str, not {type(key).__name__}")
+        items: Iterable[Any] = value.values()
+    elif type(value) in _JSON_CONTAINERS:
+        items = value
+    else:
+        items = (value,)
+
+    for item in items:
+        type_ = type(item)
+        if type_ in _JSON_SCALARS:
+            continue
+        elif type_ is float:
+            if not _isfinite(item):
+                raise ValueError(f"{item} is not a json number")
+        elif type_ in _JSON_CONTAINERS:
+            _check_json(item)
         else:
-            definitions = {}
+            raise TypeError(f"{type_.__name__} is not a json type")
+
+
+def _json_bytes(value: Any) -> bytes:
+    _check_json(value)
+    # compact utf-8 like orjson
+    return _dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+_serialize: Callable[[Any], bytes] = _json_bytes
+try:
+    # optional, orjson serializes schemas several times faster than json
+    from orjson import dumps as _orjson_dumps
+except ImportError:  # pragma: no cover
+    pass
+else:
+
+    def _orjson_bytes(value: Any) -> bytes:
+        _check_json(value)
+        return _orjson_dumps(value)
+
+    _serialize = _orjson_bytes
+
+
+def _schema_hash(schema: Any) -> Optional[bytes]:
+    """Return a digest of the json form of `schema`, or None if it isn't serializable.
+
+    Keys are not sorted since property order determines field order.
+    """
+    try:
+        return _blake2b(_serialize(schema), digest_size=16).digest()
+    except (TypeError, ValueError):
+        return None
+
+
+# least recently used fastjsonschema validators, keyed on schema hash
+_VALIDATOR_CACHE: OrderedDict[bytes, Callable[[Any], Any]] = OrderedDict()
+_VALIDATOR_CACHE_SIZE = 256
+
+
+def jsonschema_to_validator(schema: dict) -> Callable[[Any], Any]:
+    """Compile a jsonschema into a validation function with fastjsonschema.
+
+    The function returns the validated data or raises
+    `fastjsonschema.JsonSchemaValueException`. Use it instead of a model when
+    data only needs to be validated, not converted.
+    """
+    try:
+        # optional dependency, imported on first use
+        import fastjsonschema  # type: ignore
+    except ImportError as e:
+        raise ImportError(
+            "jsonschema_to_validator requires fastjsonschema, "
+            "install it with `pip install jsonschema-pydantic[validator]`"
+        ) from e
+
+    key = _schema_hash(schema)
+    if key is None:
+        # not json serializable, compile without caching
+        return fastjsonschema.compile(schema)
+
+    with _CACHE_LOCK:
+        validator = _VALIDATOR_CACHE.get(key)
+        if validator is not None:
+            _VALIDATOR_CACHE.move_to_end(key)
+            return validator
+
+    # compiled outside the lock, a racing thread compiles the same validator
+    validator = fastjsonschema.compile(schema)
+    with _CACHE_LOCK:
+        _VALIDATOR_CACHE[key] = validator
+        if len(_VALIDATOR_CACHE) > _VALIDATOR_CACHE_SIZE:
+            _VALIDATOR_CACHE.popitem(last=False)
+    return validator
+
+
+def jsonschema_to_pydantic(
+    schema: dict, definitions: Optional[dict] = None, version: int = 2
+) -> Type[BaseModelV2]:
+    """Transform a jsonschema into a pydantic model.
+
+    `definitions` defaults to the `$defs` or `definitions` of `schema`.
+    `version` selects the pydantic API: 2 (default) or 1 for `pydantic.v1`.
+    """
+    return jsonschema_to_pydantic_many([schema], definitions, version=version)[0]
+
+
+def jsonschema_to_pydantic_many(
+    schemas: Iterable[dict], definitions: Optional[dict] = None, version: int = 2
+) -> List[Type[BaseModelV2]]:
+    """Transform many jsonschemas into pydantic models.
+
+    Schemas that share definitions, e.g. the components of an OpenAPI spec,
+    share a single transform so each definition is built once for all of them.
+    """
+    impl = _version_impl(version)
+
+    # id(definitions) -> (definitions, transform). definitions are kept so the id
+    # can't be reused by another dict while transforming.
+    transformers: Dict[int, tuple] = {}
+    models = []
+    for schema in schemas:
+        schema_definitions = definitions
+        if schema_definitions is None:
+            # top level schema provides definitions
+            if "$defs" in schema:
+                schema_definitions = schema["$defs"]
+            elif "definitions" in schema:
+                schema_definitions = schema["definitions"]
+            else:
+                schema_definitions = _NO_DEFINITIONS
+
+        key = id(schema_definitions)
+        if key not in transformers:
+            transformers[key] = (schema_definitions, _transformer(schema_definitions, impl))
+        models.append(transformers[key][1](schema))
+    return models
+
+
+def _transformer(definitions: dict, impl: tuple) -> Callable[[dict], Type[BaseModelV2]]:
+    """Return a function that transforms schemas sharing `definitions`.
+
+    Models for `$ref` definitions are registered by name so that each
+    definition is built once no matter how many times it is referenced.
+    References to a definition that is still being built are emitted as
+    forward references and resolved once the top level model is built.
+    """
+    _, Field, create_model = impl
+
+    # globals used in the hot path are bound once as closure variables
+    Any_, ForwardRef_ = Any, ForwardRef
+    type_mapping, list_any, dict_str_any = _TYPE_MAPPING, _LIST_ANY, _DICT_STR_ANY
+    missing = _MISSING
+    optional, list_of, union = _optional, _list_of, _union
+    serialize, schema_hash = _serialize, _schema_hash
+    definitions_keys = _DEFINITIONS_KEYS
+    json_type_to_python = _json_type_to_python
+
+    # definition name -> model
+    models: Dict[str, Any] = {}
+    # $ref -> definition name
+    ref_names: Dict[str, str] = {}
+    # names of definitions that are being built
+    building: Set[str] = set()
+    # definition name -> forward reference, for recursive references
+    forward_refs: Dict[str, str] = {}
+    # models built by this transform, in the order they were created
+    built: List[Any] = []
+    # anyOf and anyOf member json -> converted type
+    converted: Dict[bytes, Any] = {}
+    # models built by this transform, keyed like _MODEL_CACHE. they are cached once
+    # the transform succeeds, so models with unresolved forward references aren't
+    # cached when it raises.
+    staged: Dict[tuple, Any] = {}
+
+    # each definition is serialized once, and its digest is reused as the key of
+    # its model. models are not cached when definitions aren't json serializable.
+    definition_hashes = {name: _schema_hash(schema) for name, schema in definitions.items()}
+    definitions_hash: Optional[bytes] = None
+    if None not in definition_hashes.values():
+        definitions_hash = _schema_hash(
+            [[name, digest.hex()] for name, digest in definition_hashes.items()]  # type: ignore[union-attr]
+        )
+
+    def get_model(schema: dict, schema_key: Optional[bytes] = None) -> Type[BaseModelV2]:
+        # identical schemas produce the same model, so nested objects are only built once
+        if definitions_hash is None:
+            return build_model(schema)
+        if schema_key is None:
+            keyed = schema
+            if not definitions_keys.isdisjoint(schema):
+                # definitions don't contribute to the model and are covered by definitions_hash
+                keyed = {
+                    key: value for key, value in schema.items() if key not in definitions_keys
+                }
+            schema_key = schema_hash(keyed)
+        if schema_key is None:
+            # not json serializable, build without caching
+            return build_model(schema)
+        key = (schema_key, definitions_hash, impl)
+
+        model = _MODEL_CACHE.get(key)
+        if model is not None:
+            _mark_recent(key, model)
+            return model
+
+        model = staged.get(key)
+        if model is None:
+            model = staged[key] = build_model(schema)
+        return model
 
     def convert_type(prop: dict) -> Any:
-        if "$ref" in prop:
-            ref_path = prop["$ref"].split("/")
-            ref = definitions[ref_path[-1]]
-            return jsonschema_to_pydantic(ref, definitions, version=version)
-
-        if "type" in prop:
-            type_mapping = {
-                "string": str,
-                "number": float,
-                "integer": int,
-                "boolean": bool,
-                "array": List,
-                "object": Dict[str, Any],
-                "null": None,
-            }
-
-            type_ = prop["type"]
-
-            if type_ == "array":
-                return List[convert_type(prop.get("items", {}))]  # noqa F821
+        if not prop:
+            return Any_
+
+        # each key is looked up once with get() rather than `in` followed by []
+        ref = prop.get("$ref")
+        if ref is not None:
+            return get_definition(ref_name(ref))
+
+        type_ = prop.get("type")
+        if type_ is not None:
+            if isinstance(type_, list):
+                # multiple types, e.g. ["string", "null"]
+                if "array" in type_ or "object" in type_:
+                    return union(tuple(convert_type({**prop, "type": t}) for t in type_))
+                return json_type_to_python(tuple(type_))
+
+            # primitives are the common case and resolve with a single lookup
+            python_type = type_mapping.get(type_, missing)
+            if python_type is not missing:
+                return python_type
+            elif type_ == "array":
+                items = convert_type(prop.get("items", {}))
+                return list_any if items is Any_ else list_of(items)
             elif type_ == "object":
                 if "properties" in prop:
-                    return jsonschema_to_pydantic(prop, definitions, version=version)
+                    return get_model(prop)
                 else:
-                    return Dict[str, Any]
+                    return dict_str_any
             else:
-                return type_mapping.get(type_, Any)
+                return Any_
 
-        elif "allOf" in prop:
+        all_of = prop.get("allOf")
+        if all_of is not None:
+            if len(all_of) == 1:
+                # nothing to merge, use the type of the sub-schema
+                return convert_type(all_of[0])
+
+            # merge fields of all sub-schemas into a single model
             combined_fields = {}
-            for sub_schema in prop["allOf"]:
-                model = jsonschema_to_pydantic(sub_schema, definitions, version=version)
-                combined_fields.update(model.__annotations__)
-            return create_model("CombinedModel", **combined_fields)
-
-        elif "anyOf" in prop:
-            unioned_types = tuple(convert_type(sub_schema) for sub_schema in prop["anyOf"])
-            return Union[unioned_types]  # type: ignore
-        elif prop == {} or "type" not in prop:
-            return Any
-        else:
-            raise ValueError(f"Unsupported schema: {prop}")
+            for sub_schema in all_of:
+                if "$ref" in sub_schema:
+                    name = ref_name(sub_schema["$ref"])
+                    model = models.get(name)
+                    if model is not None and getattr(model, "__pydantic_complete__", False):
+                        # v2 definition that is already built, reuse its fields. v1
+                        # fields keep unresolved forward refs so they are converted.
+                        combined_fields.update(
+                            {key: (f.annotation, f) for key, f in model.model_fields.items()}
+                        )
+                        continue
+                    sub_schema = definitions[name]
+                combined_fields.update(convert_fields(sub_schema))
+            model = create_model("CombinedModel", __module__=__name__, **combined_fields)
+            built.append(model)
+            return model
+
+        any_of = prop.get("anyOf")
+        if any_of is not None:
+            if len(any_of) == 1:
+                return convert_type(any_of[0])
+            return convert_cached(any_of, convert_union)
 
-    fields = {}
-    required_fields = schema.get("required", [])
+        # no type information
+        return Any_
 
-    for name, prop in schema.get("properties", {}).items():
+    def convert_union(any_of: list) -> Any:
+        # members repeat often across unions, e.g. {"type": "null"}
+        unioned_types = tuple(convert_cached(sub_schema, convert_type) for sub_schema in any_of)
+        return union(unioned_types)
+
+    def convert_cached(schema: Any, convert: Callable[[Any], Any]) -> Any:
+        # identical unions, e.g. items of arrays, reuse the same typing object
+        try:
+            key = serialize(schema)
+        except (TypeError, ValueError):
+            return convert(schema)
+        if key not in converted:
+            converted[key] = convert(schema)
+        return converted[key]
+
+    def get_definition(name: str) -> Any:
+        if name in models:
+            return models[name]
+        if name in building:
+            # recursive reference, resolved after the top level model is built
+            if name not in forward_refs:
+                forward_refs[name] = f"_Ref{len(forward_refs)}"
+            return ForwardRef_(forward_refs[name])
+
+        building.add(name)
+        try:
+            models[name] = get_model(definitions[name], definition_hashes[name])
+        finally:
+            building.discard(name)
+        return models[name]
+
+    def ref_name(ref: str) -> str:
+        name = ref_names.get(ref)
+        if name is None:
+            name = ref_names[ref] = ref.rpartition("/")[2]
+        return name
+
+    def convert_field(prop: dict, required: bool) -> tuple:
         pydantic_type = convert_type(prop)
-        field_kwargs = {}
-        if "default" in prop:
-            field_kwargs["default"] = prop["default"]
-        if name not in required_fields:
-            pydantic_type = Optional[pydantic_type]
-            if "default" not in field_kwargs:
-                field_kwargs["default"] = None
-        if "description" in prop:
-            field_kwargs["description"] = prop["description"]
-
-        fields[name] = (pydantic_type, Field(**field_kwargs))
-
-    model = create_model(title, **fields)
-    if description:
-        model.__doc__ = description
-    return model
+        # ... marks the field as required
+        default = prop.get("default", ...)
+        if not required:
+            pydantic_type = optional(pydantic_type)
+            if default is ...:
+                default = None
+
+        description = prop.get("description")
+        if description is not None:
+            return pydantic_type, Field(default, description=description)
+        # no metadata, pass the default as is rather than creating a FieldInfo
+        return pydantic_type, default
+
+    def convert_fields(schema: dict) -> Dict[str, tuple]:
+        required_fields = frozenset(schema.get("required", ()))
+        # names don't need sys.intern, keywords passed to create_model are interned
+        return {
+            name: convert_field(prop, name in required_fields)
+            for name, prop in schema.get("properties", {}).items()
+        }
+
+    def build_model(schema: dict) -> Type[BaseModelV2]:
+        title = schema.get("title", "DynamicModel")
+        description = schema.get("description", None)
+
+        # an explicit module skips create_model's lookup of the caller's frame.
+        # models are not given __slots__ since pydantic keeps field values in the
+        # instance __dict__, and are not frozen so instances stay mutable.
+        model = create_model(title, __module__=__name__, **convert_fields(schema))
+        if description:
+            model.__doc__ = description
+        built.append(model)
+        return model
+
+    def transform(schema: dict) -> Type[BaseModelV2]:
+        model = get_model(schema)
+
+        if forward_refs:
+            namespace = {ref: models[name] for name, ref in forward_refs.items()}
+            for built_model in built:
+                if hasattr(built_model, "model_rebuild"):
+                    built_model.model_rebuild(_types_namespace=namespace)
+                else:
+                    # pydantic.v1
+                    built_model.update_forward_refs(**namespace)
+            # converted types may hold forward references that are now resolved
+            forward_refs.clear()
+            converted.clear()
+        built.clear()
+
+        for key, staged_model in staged.items():
+            _MODEL_CACHE[key] = staged_model
+            _mark_recent(key, staged_model)
+        staged.clear()
+
+        return model
+
+    return transform
+
+
+def cache_clear() -> None:
+    """Clear cached models and validators, e.g. to isolate tests"""
+    _MODEL_CACHE.clear()
+    with _CACHE_LOCK:
+        _RECENT_MODELS.clear()
+        _VALIDATOR_CACHE.clear()
+    _optional_cached.cache_clear()
+    _union_cached.cache_clear()
+    _list_of_cached.cache_clear()
@@ -1,4 +1,5 @@
 """Python setup.py for jsonschema_pydantic package"""
+
 import io
 import os
 from setuptools import find_packages, setup
@@ -29,6 +30,17 @@ def read_requirements(path):
     ]
 
 
+def ext_modules():
+    """Compile the transform with mypyc when JSONSCHEMA_PYDANTIC_COMPILE is set.
+    The pure python module is used when the extension isn't built.
+    """
+    if not os.environ.get("JSONSCHEMA_PYDANTIC_COMPILE"):
+        return []
+    from mypyc.build import mypycify
+
+    return mypycify(["jsonschema_pydantic/transform.py"])
+
+
 setup(
     name="jsonschema_pydantic",
     version=read("jsonschema_pydantic", "VERSION"),
@@ -42,5 +54,10 @@ setup(
     package_data={
         "jsonschema_pydantic": ["VERSION"],
     },
-    extras_require={"test": read_requirements("requirements-test.txt")},
+    extras_require={
+        "test": read_requirements("requirements-test.txt"),
+        "validator": ["fastjsonschema"],
+        "orjson": ["orjson"],
+    },
+    ext_modules=ext_modules(),
 )
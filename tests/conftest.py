@@ -0,0 +1,56 @@
+import pytest
+from jsonschema_pydantic import jsonschema_to_pydantic
+from tests.schemas import (
+    ARRAY_OF_ANY_SCHEMA,
+    ARRAY_OF_UNION_SCHEMA,
+    ARRAY_SCHEMA,
+    NESTED_SCHEMA,
+    UNION_SCHEMA,
+)
+
+FIXTURE_SCHEMAS = (
+    ARRAY_SCHEMA,
+    NESTED_SCHEMA,
+    UNION_SCHEMA,
+    ARRAY_OF_UNION_SCHEMA,
+    ARRAY_OF_ANY_SCHEMA,
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _warm():
+    """Build fixture models before any test so --durations reflects the tests alone"""
+    # the models are returned so the cache holds them for the whole session
+    return [
+        jsonschema_to_pydantic(schema, version=version)
+        for version in (1, 2)
+        for schema in FIXTURE_SCHEMAS
+    ]
+
+
+# models are built once per test class since the class selects the pydantic version
+
+
+@pytest.fixture(scope="class")
+def array_model(request):
+    return jsonschema_to_pydantic(ARRAY_SCHEMA, version=request.cls.version)
+
+
+@pytest.fixture(scope="class")
+def nested_model(request):
+    return jsonschema_to_pydantic(NESTED_SCHEMA, version=request.cls.version)
+
+
+@pytest.fixture(scope="class")
+def union_model(request):
+    return jsonschema_to_pydantic(UNION_SCHEMA, version=request.cls.version)
+
+
+@pytest.fixture(scope="class")
+def array_of_union_model(request):
+    return jsonschema_to_pydantic(ARRAY_OF_UNION_SCHEMA, version=request.cls.version)
+
+
+@pytest.fixture(scope="class")
+def array_of_any_model(request):
+    return jsonschema_to_pydantic(ARRAY_OF_ANY_SCHEMA, version=request.cls.version)
@@ -0,0 +1,101 @@
+"""Reference models and their schemas, shared by tests and fixtures"""
+
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, Field
+
+
+class ObjectType(BaseModel):
+    """Basic object type"""
+
+    name: str = Field(description="mock str field")
+    age: int
+    check: bool
+
+
+class ObjectDefaults(BaseModel):
+    name: str = "John"
+    age: int = 21
+    check: bool = True
+
+
+class ObjectOptional(BaseModel):
+    name: Optional[str]
+    age: Optional[int]
+    check: Optional[bool]
+    child: Optional[ObjectType]
+
+
+class OptionalDefaults(BaseModel):
+    name: Optional[str] = "John"
+    age: Optional[int] = 21
+    check: Optional[bool] = True
+    child: Optional[ObjectType] = None
+
+
+class OptionalDefaultFactory(BaseModel):
+    name: Dict = Field(default_factory=dict)
+
+
+class ArrayType(BaseModel):
+    name: str
+    array: List[ObjectType]
+
+
+class NestedObjectType(BaseModel):
+    child: ObjectType
+
+
+class UnionType(BaseModel):
+    primitives: Union[str, int, bool]
+
+    # Unioned objects not supported yet, pydantic seemed to have a problem
+    # converting this to a schema
+    objects: Union[ObjectType, ObjectDefaults, ObjectOptional]
+
+
+# fixture schemas are generated once rather than in every test
+ARRAY_SCHEMA = ArrayType.model_json_schema()
+NESTED_SCHEMA = NestedObjectType.model_json_schema()
+UNION_SCHEMA = UnionType.model_json_schema()
+OPTIONAL_DEFAULTS_SCHEMA = OptionalDefaults.model_json_schema()
+
+# arrays with extra keywords that aren't converted
+ARRAY_OF_UNION_SCHEMA = {
+    "display_groups": None,
+    "properties": {
+        "tags": {
+            "items": {
+                "anyOf": [
+                    {"type": "integer"},
+                    {"type": "number"},
+                    {"type": "boolean"},
+                    {"type": "string"},
+                    {"type": "object"},
+                ]
+            },
+            "maxItems": None,
+            "minItems": None,
+            "style": {"width": "100%"},
+            "type": "array",
+            "uniqueItems": False,
+        },
+    },
+    "required": [],
+    "type": "object",
+}
+
+ARRAY_OF_ANY_SCHEMA = {
+    "display_groups": None,
+    "properties": {
+        "tags": {
+            "items": {},
+            "maxItems": None,
+            "minItems": None,
+            "style": {"width": "100%"},
+            "type": "array",
+            "uniqueItems": False,
+        },
+    },
+    "required": [],
+    "type": "object",
+}
@@ -1,56 +1,57 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import datetime
+from enum import Enum, IntEnum
+from functools import partial
+import gc
+import subprocess
+import sys
+import time
+import weakref
 import pytest
-from typing import Dict, List, Optional, Union
-from pydantic import BaseModel, Field
-from jsonschema_pydantic.transform import jsonschema_to_pydantic
+from jsonschema_pydantic import cache_clear, transform
+from jsonschema_pydantic.transform import (
+    jsonschema_to_pydantic,
+    jsonschema_to_pydantic_many,
+    jsonschema_to_validator,
+)
+from tests.schemas import (
+    ARRAY_SCHEMA,
+    NESTED_SCHEMA,
+    OPTIONAL_DEFAULTS_SCHEMA,
+    UNION_SCHEMA,
+    ObjectDefaults,
+    ObjectType,
+)
 
 
-class ObjectType(BaseModel):
-    """Basic object type"""
+class Color(str, Enum):
+    RED = "red"
 
-    name: str = Field(description="mock str field")
-    age: int
-    check: bool
 
+class Size(IntEnum):
+    ONE = 1
 
-class ObjectDefaults(BaseModel):
-    name: str = "John"
-    age: int = 21
-    check: bool = True
 
+class YieldingOrderedDict(OrderedDict):
+    """Switches threads after lookups so racing threads interleave inside a cache"""
 
-class ObjectOptional(BaseModel):
-    name: Optional[str]
-    age: Optional[int]
-    check: Optional[bool]
-    child: Optional[ObjectType]
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        time.sleep(0.001)
+        return value
 
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        time.sleep(0.001)
 
-class OptionalDefaults(BaseModel):
-    name: Optional[str] = "John"
-    age: Optional[int] = 21
-    check: Optional[bool] = True
-    child: Optional[ObjectType] = None
 
-
-class OptionalDefaultFactory(BaseModel):
-    name: Dict = Field(default_factory=dict)
-
-
-class ArrayType(BaseModel):
-    name: str
-    array: List[ObjectType]
-
-
-class NestedObjectType(BaseModel):
-    child: ObjectType
-
-
-class UnionType(BaseModel):
-    primitives: Union[str, int, bool]
-
-    # Unioned objects not supported yet, pydantic seemed to have a problem
-    # converting this to a schema
-    objects: Union[ObjectType, ObjectDefaults, ObjectOptional]
+def construct(model, **data):
+    """Create an instance from trusted data, skipping validation"""
+    if hasattr(model, "model_construct"):
+        return model.model_construct(**data)
+    return model.construct(**data)
 
 
 class TestTransform:
@@ -109,9 +110,9 @@ class TestTransform:
         assert instance.integer == 1
         assert instance.boolean is True
 
-    def test_array_type(self):
-        schema = ArrayType.schema()
-        model = jsonschema_to_pydantic(schema, version=self.version)
+    def test_array_type(self, array_model):
+        schema = ARRAY_SCHEMA
+        model = array_model
 
         if self.version == 1:
             expected_schema = {
@@ -157,9 +158,9 @@ class TestTransform:
         assert instance.array[0].age == 1
         assert instance.array[0].check is True
 
-    def test_recursive_object_type(self):
-        schema = NestedObjectType.schema()
-        model = jsonschema_to_pydantic(schema, version=self.version)
+    def test_recursive_object_type(self, nested_model):
+        schema = NESTED_SCHEMA
+        model = nested_model
 
         if self.version == 1:
             expected_schema = {
@@ -197,39 +198,61 @@ class TestTransform:
         assert instance.child.age == 1
         assert instance.child.check is True
 
-    def test_anyOf_type(self):
-        schema = UnionType.schema()
-        model = jsonschema_to_pydantic(schema, version=self.version)
-
-        # test initializing model
-        # The ObjectDefaults must be a dict since the model has a dynamic version of ObjectType
-        instance = model(primitives="test", objects=ObjectDefaults().dict())
-        assert instance.primitives == "test"
-        assert instance.objects.name == "John"
-        assert instance.objects.age == 21
-        assert instance.objects.check is True
-        assert instance.dict() == {
-            "primitives": "test",
-            "objects": {"name": "John", "age": 21, "check": True},
-        }
-
-        # initialize with ObjectType
-        # The ObjectType must be a dict since the model has a dynamic version of ObjectType
-        instance = model(
-            primitives="test", objects=ObjectType(name="test", age=1, check=True).dict()
-        )
+    @pytest.mark.parametrize(
+        "objects",
+        [
+            # The objects must be dicts since the model has dynamic versions of the types
+            ObjectDefaults().dict(),
+            ObjectType(name="test", age=1, check=True).dict(),
+        ],
+        ids=["ObjectDefaults", "ObjectType"],
+    )
+    def test_anyOf_type(self, union_model, objects):
+        instance = union_model(primitives="test", objects=objects)
         assert instance.primitives == "test"
-        assert instance.objects.name == "test"
-        assert instance.objects.age == 1
+        assert instance.objects.name == objects["name"]
+        assert instance.objects.age == objects["age"]
         assert instance.objects.check is True
-        assert instance.dict() == {
-            "primitives": "test",
-            "objects": {"name": "test", "age": 1, "check": True},
-        }
+        assert instance.dict() == {"primitives": "test", "objects": objects}
 
         # Pydantic is unable to convert the model back to a schema even though it seems right
         # the other tests show the model is working as expected
-        # assert model.schema() == schema
+        # assert model.schema() == UNION_SCHEMA
+
+    def test_construct(self):
+        """Generated models can be constructed without validation"""
+        schema = OPTIONAL_DEFAULTS_SCHEMA
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = construct(model, name="test", age=1)
+        assert instance.name == "test"
+        assert instance.age == 1
+        assert instance.check is True
+        assert instance.child is None
+
+    def test_schema_not_modified(self):
+        """Schemas are read without being copied or modified"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "array": {"$ref": "#/$defs/ArrayType"},
+                "union": {"$ref": "#/$defs/UnionType"},
+                "combined": {"allOf": [{"$ref": "#/$defs/ArrayType"}, NESTED_SCHEMA]},
+                "types": {"type": ["object", "null"], "properties": {"a": {"type": "string"}}},
+            },
+            "$defs": {
+                **UNION_SCHEMA["$defs"],
+                "ArrayType": ARRAY_SCHEMA,
+                "UnionType": UNION_SCHEMA,
+            },
+        }
+        expected = copy.deepcopy(schema)
+        jsonschema_to_pydantic(schema, version=self.version)
+        assert schema == expected
+
+    def test_unsupported_version(self):
+        with pytest.raises(ValueError, match="Unsupported version: 3"):
+            jsonschema_to_pydantic({"type": "object"}, version=3)
 
 
 class TestTransformV1(TestTransform):
@@ -239,42 +262,16 @@ class TestTransformV1(TestTransform):
 class TestArrays:
     version = 2
 
-    def test_array(self):
+    @pytest.mark.parametrize(
+        "tags,expected",
+        [(["test"], ["test"]), ([1], [1.0]), ([{"test": 1}], [{"test": 1}])],
+    )
+    def test_array(self, array_of_union_model, tags, expected):
         """Test an array with many types"""
+        instance = array_of_union_model(tags=tags)
+        assert instance.tags == expected
 
-        schema = {
-            "display_groups": None,
-            "properties": {
-                "tags": {
-                    "items": {
-                        "anyOf": [
-                            {"type": "integer"},
-                            {"type": "number"},
-                            {"type": "boolean"},
-                            {"type": "string"},
-                            {"type": "object"},
-                        ]
-                    },
-                    "maxItems": None,
-                    "minItems": None,
-                    "style": {"width": "100%"},
-                    "type": "array",
-                    "uniqueItems": False,
-                },
-            },
-            "required": [],
-            "type": "object",
-        }
-
-        model = jsonschema_to_pydantic(schema, version=self.version)
-
-        instance = model(tags=["test"])
-        assert instance.tags == ["test"]
-        instance = model(tags=[1])
-        assert instance.tags == [1.0]
-        instance = model(tags=[{"test": 1}])
-        assert instance.tags == [{"test": 1}]
-
+    def test_array_schema(self, array_of_union_model):
         if self.version == 1:
             expected_schema = {
                 "title": "DynamicModel",
@@ -321,38 +318,21 @@ class TestArrays:
                 "title": "DynamicModel",
                 "type": "object",
             }
-        assert model.schema() == expected_schema
-
-    def test_array_of_any(self):
-        schema = {
-            "display_groups": None,
-            "properties": {
-                "tags": {
-                    "items": {},
-                    "maxItems": None,
-                    "minItems": None,
-                    "style": {"width": "100%"},
-                    "type": "array",
-                    "uniqueItems": False,
-                },
-            },
-            "required": [],
-            "type": "object",
-        }
-
-        model = jsonschema_to_pydantic(schema, version=self.version)
-
-        instance = model(tags=["test"])
-        assert instance.tags == ["test"]
-        instance = model(tags=[1])
-        assert instance.tags == [1.0]
-        instance = model(tags=[{"test": 1}])
-        assert instance.tags == [{"test": 1}]
-
-        instance = model(tags=None)
-        assert instance.tags is None
-        instance = model()
-        assert instance.tags is None
+        assert array_of_union_model.schema() == expected_schema
+
+    @pytest.mark.parametrize(
+        "data,expected",
+        [
+            ({"tags": ["test"]}, ["test"]),
+            ({"tags": [1]}, [1.0]),
+            ({"tags": [{"test": 1}]}, [{"test": 1}]),
+            ({"tags": None}, None),
+            ({}, None),
+        ],
+    )
+    def test_array_of_any(self, array_of_any_model, data, expected):
+        instance = array_of_any_model(**data)
+        assert instance.tags == expected
 
     def test_any_type(self):
         """Property with no type is converted to Any"""
@@ -393,6 +373,26 @@ class TestArrays:
         instance = model()
         assert instance.value is None
 
+    def test_repeated_array_type(self):
+        """Arrays of the same items share a single typing alias"""
+        items = {"type": "object", "properties": {"name": {"type": "string"}}}
+        schema = {
+            "type": "object",
+            "properties": {
+                "first": {"type": "array", "items": items},
+                "second": {"type": "array", "items": dict(items)},
+            },
+            "required": ["first", "second"],
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        if self.version == 1:
+            first, second = model.__fields__["first"], model.__fields__["second"]
+            assert first.outer_type_ is second.outer_type_
+        elif self.version == 2:
+            first, second = model.model_fields["first"], model.model_fields["second"]
+            assert first.annotation is second.annotation
+
 
 class TestArraysV1(TestArrays):
     version = 1
@@ -456,6 +456,512 @@ class TestUnions:
         instance = model()
         assert instance.query_args is None
 
+    def test_single_member_union(self):
+        schema = {
+            "type": "object",
+            "properties": {"value": {"anyOf": [{"type": "string"}]}},
+            "required": ["value"],
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        assert model.schema()["properties"]["value"]["type"] == "string"
+
+    def test_repeated_union_members(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "first": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+                "second": {"anyOf": [{"type": "integer"}, {"type": "null"}]},
+                "objects": {
+                    "anyOf": [
+                        {"type": "object", "properties": {"name": {"type": "string"}}},
+                        {"type": "object", "properties": {"name": {"type": "string"}}},
+                    ]
+                },
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = model(first=None, second=1, objects={"name": "test"})
+        assert instance.first is None
+        assert instance.second == 1
+        assert instance.objects.name == "test"
+
+    def test_type_list(self):
+        """A list of types is a union of the types"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "search": {"type": ["string", "null"]},
+                "tags": {"type": ["array", "null"], "items": {"type": "string"}},
+            },
+            "required": ["search", "tags"],
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = model(search="test", tags=["a"])
+        assert instance.search == "test"
+        assert instance.tags == ["a"]
+        instance = model(search=None, tags=None)
+        assert instance.search is None
+        assert instance.tags is None
+
 
 class TestUnionsV1(TestUnions):
     version = 1
+
+
+class TestAllOf:
+    version = 2
+
+    def test_all_of(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "combined": {
+                    "allOf": [
+                        {"$ref": "#/$defs/Named"},
+                        {
+                            "type": "object",
+                            "properties": {"age": {"type": "integer", "default": 21}},
+                        },
+                    ]
+                }
+            },
+            "required": ["combined"],
+            "$defs": {
+                "Named": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string", "description": "mock str field"}},
+                    "required": ["name"],
+                }
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = model(combined={"name": "test"})
+        assert instance.combined.name == "test"
+        assert instance.combined.age == 21
+
+        combined_schema = type(instance.combined).schema()
+        assert combined_schema["properties"]["name"]["description"] == "mock str field"
+        assert combined_schema["required"] == ["name"]
+
+        with pytest.raises(ValueError):
+            model(combined={"age": 1})
+
+    def test_single_all_of(self):
+        """allOf with a single sub-schema reuses the sub-schema's model"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "combined": {"allOf": [{"$ref": "#/$defs/Named"}]},
+                "named": {"$ref": "#/$defs/Named"},
+                "inline": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}},
+                    "required": ["name"],
+                },
+            },
+            "$defs": {
+                "Named": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}},
+                    "required": ["name"],
+                }
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = model(combined={"name": "a"}, named={"name": "b"}, inline={"name": "c"})
+        assert instance.combined.name == "a"
+        assert type(instance.combined) is type(instance.named)
+
+        # inline objects identical to a definition share its model
+        assert type(instance.inline) is type(instance.named)
+
+    def test_single_all_of_primitive(self):
+        """allOf with a single primitive sub-schema uses the primitive type"""
+        schema = {
+            "type": "object",
+            "properties": {"value": {"allOf": [{"type": "string", "minLength": 1}]}},
+            "required": ["value"],
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        assert model(value="abc").value == "abc"
+        with pytest.raises(ValueError):
+            model(value=[1])
+
+
+class TestAllOfV1(TestAllOf):
+    version = 1
+
+
+class TestRecursion:
+    version = 2
+
+    def test_self_reference(self):
+        schema = {
+            "type": "object",
+            "properties": {"root": {"$ref": "#/$defs/Node"}},
+            "required": ["root"],
+            "$defs": {
+                "Node": {
+                    "type": "object",
+                    "title": "Node",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "children": {"type": "array", "items": {"$ref": "#/$defs/Node"}},
+                    },
+                    "required": ["name"],
+                }
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = model(root={"name": "a", "children": [{"name": "b", "children": []}]})
+        assert instance.root.name == "a"
+        assert instance.root.children[0].name == "b"
+        assert type(instance.root.children[0]) is type(instance.root)
+
+    def test_mutual_reference(self):
+        schema = {
+            "type": "object",
+            "title": "A",
+            "properties": {"b": {"$ref": "#/$defs/B"}},
+            "$defs": {
+                "A": {
+                    "type": "object",
+                    "title": "A",
+                    "properties": {"b": {"$ref": "#/$defs/B"}},
+                },
+                "B": {
+                    "type": "object",
+                    "title": "B",
+                    "properties": {"a": {"$ref": "#/$defs/A"}},
+                },
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+
+        instance = model(b={"a": {"b": {"a": None}}})
+        assert instance.b.a.b.a is None
+        assert type(instance.b.a.b) is type(instance.b)
+
+
+class TestRecursionV1(TestRecursion):
+    version = 1
+
+
+class TestMany:
+    version = 2
+
+    def test_shared_definitions(self):
+        """Schemas sharing definitions share the definition models"""
+        definitions = {
+            "Child": {
+                "type": "object",
+                "title": "Child",
+                # not json serializable so models are not shared through the cache
+                "properties": {"name": {"type": "string", "default": object()}},
+            }
+        }
+        schemas = [
+            {"type": "object", "properties": {"child": {"$ref": "#/$defs/Child"}}},
+            {
+                "type": "object",
+                "properties": {"children": {"type": "array", "items": {"$ref": "#/$defs/Child"}}},
+            },
+        ]
+        first, second = jsonschema_to_pydantic_many(
+            schemas, definitions=definitions, version=self.version
+        )
+
+        first_instance = first(child={"name": "a"})
+        second_instance = second(children=[{"name": "b"}])
+        assert type(first_instance.child) is type(second_instance.children[0])
+
+    def test_schema_definitions(self):
+        """Each schema provides its own definitions by default"""
+        schemas = [ARRAY_SCHEMA, NESTED_SCHEMA, {"type": "object"}]
+        array_model, nested_model, empty_model = jsonschema_to_pydantic_many(
+            schemas, version=self.version
+        )
+
+        instance = array_model(name="test", array=[{"name": "test", "age": 1, "check": True}])
+        assert instance.array[0].name == "test"
+        instance = nested_model(child={"name": "test", "age": 1, "check": True})
+        assert instance.child.name == "test"
+        assert empty_model().dict() == {}
+
+
+class TestManyV1(TestMany):
+    version = 1
+
+
+class TestImport:
+    def test_v1_imported_on_use(self):
+        """pydantic.v1 is only imported when version 1 is requested"""
+        code = (
+            "import sys; from jsonschema_pydantic import jsonschema_to_pydantic; "
+            "jsonschema_to_pydantic({'type': 'object'}); "
+            "assert 'pydantic.v1' not in sys.modules; "
+            "jsonschema_to_pydantic({'type': 'object'}, version=1); "
+            "assert 'pydantic.v1' in sys.modules"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    def test_v2_imported_on_use(self):
+        """pydantic models are only imported when a schema is transformed"""
+        code = (
+            "import sys; from jsonschema_pydantic import jsonschema_to_pydantic; "
+            "assert 'pydantic.main' not in sys.modules; "
+            "jsonschema_to_pydantic({'type': 'object'}); "
+            "assert 'pydantic.main' in sys.modules"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+
+class TestCache:
+    version = 2
+
+    def test_identical_schemas(self):
+        """Identical schemas return the same model"""
+        schema = {
+            "type": "object",
+            "properties": {"name": {"type": "string"}},
+            "required": ["name"],
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        assert jsonschema_to_pydantic(dict(schema), version=self.version) is model
+
+    def test_repeated_ref(self):
+        """Repeated $refs share a single model"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "first": {"$ref": "#/$defs/Child"},
+                "second": {"$ref": "#/$defs/Child"},
+            },
+            "$defs": {
+                "Child": {
+                    "type": "object",
+                    "title": "Child",
+                    "properties": {"name": {"type": "string"}},
+                }
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        instance = model(first={"name": "a"}, second={"name": "b"})
+        assert type(instance.first) is type(instance.second)
+
+    def test_unserializable_schema(self):
+        """Schemas that can't be serialized to json are built without caching"""
+        schema = {
+            "type": "object",
+            "properties": {"value": {"type": "string", "default": object()}},
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        assert jsonschema_to_pydantic(schema, version=self.version) is not model
+
+    def test_repeated_ref_unserializable(self):
+        """Repeated $refs share a model even when definitions can't be cached"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "first": {"$ref": "#/$defs/Child"},
+                "second": {"type": "array", "items": {"$ref": "#/$defs/Child"}},
+            },
+            "$defs": {
+                "Child": {
+                    "type": "object",
+                    "title": "Child",
+                    "properties": {"name": {"type": "string", "default": object()}},
+                }
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        instance = model(first={"name": "a"}, second=[{"name": "b"}])
+        assert type(instance.first) is type(instance.second[0])
+
+    def test_recent_models_threads(self, monkeypatch):
+        """Models can be marked recent and evicted concurrently"""
+        monkeypatch.setattr(transform, "_RECENT_MODELS", YieldingOrderedDict())
+        monkeypatch.setattr(transform, "_MODEL_CACHE_SIZE", 2)
+        schemas = [
+            {"type": "object", "properties": {f"field_{i}": {"type": "string"}}} for i in range(6)
+        ] * 20
+        transform_schema = partial(jsonschema_to_pydantic, version=self.version)
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(transform_schema, schemas))
+
+    def test_unused_definitions_not_built(self):
+        """Definitions that aren't referenced aren't resolved"""
+        schema = {
+            "type": "object",
+            "properties": {"name": {"type": "string"}},
+            "$defs": {
+                "External": {
+                    "type": "object",
+                    "properties": {"thing": {"$ref": "other.json#/definitions/Thing"}},
+                }
+            },
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        assert model(name="a").name == "a"
+
+    def test_failed_transform_not_cached(self):
+        """Models of a transform that raises aren't cached with unresolved references"""
+        cache_clear()
+        definitions = {
+            "Node": {
+                "type": "object",
+                "title": "Node",
+                "properties": {"children": {"type": "array", "items": {"$ref": "#/$defs/Node"}}},
+            }
+        }
+        invalid = {
+            "type": "object",
+            "properties": {
+                "node": {"$ref": "#/$defs/Node"},
+                "missing": {"$ref": "#/$defs/Missing"},
+            },
+            "$defs": definitions,
+        }
+        with pytest.raises(KeyError):
+            jsonschema_to_pydantic(invalid, version=self.version)
+
+        valid = {
+            "type": "object",
+            "properties": {"node": {"$ref": "#/$defs/Node"}},
+            "$defs": definitions,
+        }
+        model = jsonschema_to_pydantic(valid, version=self.version)
+        instance = model(node={"children": [{"children": []}]})
+        assert instance.node.children[0].children == []
+
+    def test_definitions_with_same_name(self):
+        """Definitions with the same name but different schemas don't share a model"""
+
+        def make_schema(child_type):
+            return {
+                "type": "object",
+                "properties": {"child": {"$ref": "#/$defs/Child"}},
+                "$defs": {
+                    "Child": {
+                        "type": "object",
+                        "title": "Child",
+                        "properties": {"value": {"type": child_type}},
+                    }
+                },
+            }
+
+        string_model = jsonschema_to_pydantic(make_schema("string"), version=self.version)
+        integer_model = jsonschema_to_pydantic(make_schema("integer"), version=self.version)
+        assert string_model is not integer_model
+        assert string_model(child={"value": "a"}).child.value == "a"
+        assert integer_model(child={"value": 1}).child.value == 1
+
+    def test_property_order(self):
+        """Schemas with the same properties in a different order don't share a model"""
+        schema = {
+            "type": "object",
+            "properties": {"name": {"type": "string"}, "age": {"type": "integer"}},
+        }
+        reversed_schema = {
+            "type": "object",
+            "properties": {"age": {"type": "integer"}, "name": {"type": "string"}},
+        }
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        reversed_model = jsonschema_to_pydantic(reversed_schema, version=self.version)
+        assert list(model.schema()["properties"]) == ["name", "age"]
+        assert list(reversed_model.schema()["properties"]) == ["age", "name"]
+
+    @pytest.mark.parametrize("serializer", ["_json_bytes", "_orjson_bytes"])
+    @pytest.mark.parametrize(
+        "default,other",
+        [
+            (datetime.datetime(2024, 1, 1), "2024-01-01T00:00:00"),
+            (float("nan"), None),
+            (float("inf"), None),
+            (Color.RED, "red"),
+            (Size.ONE, 1),
+            ({1: "a"}, {"1": "a"}),
+            (("a",), ["a"]),
+        ],
+        ids=["datetime", "nan", "inf", "str-enum", "int-enum", "int-key", "tuple"],
+    )
+    def test_serialized_default(self, monkeypatch, serializer, default, other):
+        """Defaults don't share a model with a different value that serializes the same"""
+        if not hasattr(transform, serializer):
+            pytest.skip(f"{serializer} requires orjson")
+        monkeypatch.setattr(transform, "_serialize", getattr(transform, serializer))
+
+        schema = {"type": "object", "properties": {"value": {"default": default}}}
+        other_schema = {"type": "object", "properties": {"value": {"default": other}}}
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        other_model = jsonschema_to_pydantic(other_schema, version=self.version)
+        # repr since nan != nan and enums equal their value
+        assert repr(model().value) == repr(default)
+        assert repr(other_model().value) == repr(other)
+
+    def test_evicted_model_in_use(self, monkeypatch):
+        """Models evicted from the most recently used are cached while referenced"""
+        monkeypatch.setattr(transform, "_MODEL_CACHE_SIZE", 1)
+        schema = {"type": "object", "properties": {"name": {"type": "string"}}}
+        other = {"type": "object", "properties": {"age": {"type": "integer"}}}
+
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        jsonschema_to_pydantic(other, version=self.version)
+        assert jsonschema_to_pydantic(schema, version=self.version) is model
+
+    def test_evicted_model_collected(self, monkeypatch):
+        """Models evicted from the most recently used are dropped once unreferenced"""
+        monkeypatch.setattr(transform, "_MODEL_CACHE_SIZE", 1)
+        # other tests may hold a model of the same schema
+        cache_clear()
+        schema = {"type": "object", "properties": {"name": {"type": "string"}}}
+        other = {"type": "object", "properties": {"age": {"type": "integer"}}}
+
+        model = weakref.ref(jsonschema_to_pydantic(schema, version=self.version))
+        jsonschema_to_pydantic(other, version=self.version)
+        gc.collect()
+        assert model() is None
+
+    def test_cache_clear(self):
+        schema = {"type": "object", "properties": {"name": {"type": "string"}}}
+        model = jsonschema_to_pydantic(schema, version=self.version)
+        cache_clear()
+        assert jsonschema_to_pydantic(schema, version=self.version) is not model
+
+
+class TestCacheV1(TestCache):
+    version = 1
+
+
+class TestValidator:
+    def test_validator(self):
+        fastjsonschema = pytest.importorskip("fastjsonschema")
+        validate = jsonschema_to_validator(ObjectType.model_json_schema())
+
+        data = {"name": "John", "age": 21, "check": True}
+        assert validate(data) == data
+        with pytest.raises(fastjsonschema.JsonSchemaValueException):
+            validate({"name": "John", "age": "21", "check": True})
+
+    def test_validator_cache(self):
+        """Identical schemas return the same validator"""
+        pytest.importorskip("fastjsonschema")
+        schema = ObjectType.model_json_schema()
+        validate = jsonschema_to_validator(schema)
+        assert jsonschema_to_validator(dict(schema)) is validate
+        cache_clear()
+        assert jsonschema_to_validator(schema) is not validate
+
+    def test_validator_cache_threads(self, monkeypatch):
+        """Validators can be looked up and evicted concurrently"""
+        pytest.importorskip("fastjsonschema")
+        monkeypatch.setattr(transform, "_VALIDATOR_CACHE", YieldingOrderedDict())
+        monkeypatch.setattr(transform, "_VALIDATOR_CACHE_SIZE", 2)
+        schemas = [{"type": "object", "minProperties": i} for i in range(6)] * 20
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(jsonschema_to_validator, schemas))